@@ -1,29 +1,46 @@
 import logging
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-import tomlkit
+import tomli_w
 from dotenv import load_dotenv
-from .gitlab_api import GitLabAPI
+from packaging.utils import canonicalize_name
+from .gitlab_api import GitLabAPI, ProjectDict
+
+try:
+    import tomllib
+except ModuleNotFoundError:
+    import tomli as tomllib
 
 script_path = Path(__file__)
 env_path = script_path.parent.parent.parent / ".env"
 load_dotenv(env_path)
 
+_DEP_NAME_RE = re.compile(r"\s*([A-Za-z0-9_.\-]+)")
+_UPDATABLE_SPECS = (" @ git+", ">=", "==")
+
 
 @dataclass
 class ProjectInfo:
     name: str
     url: str
+    path: str
     dependencies: List[str]
 
 
 class DependencyManager:
-    def __init__(self, group_id=None):
-        self.api = GitLabAPI()
+    def __init__(self, group_id=None, api: Optional[GitLabAPI] = None):
+        self.api = api or GitLabAPI.get_instance()
         self._projects: Dict[int, ProjectInfo] = {}
+        self._name_to_url: Dict[str, str] = {}
+        self._pyprojects: Dict[int, Optional[str]] = {}
+        self._reverse_deps: Dict[str, List[int]] = {}
         self._group_id = group_id
+        self._projects_stale = False
 
         if group_id:
             self._projects = self._load_group_projects(group_id)
@@ -31,18 +48,34 @@ class DependencyManager:
             logging.error("DependencyManager didn't get group_id")
             raise ValueError
 
+    @property
+    def group_id(self) -> Optional[int]:
+        return self._group_id
+
     def _load_group_projects(self, group_id: int) -> Dict[int, ProjectInfo]:
         try:
             projects = {}
             projects_response = self.api.get_all_projects_from_group(group_id)
-            dependencies = self._parse_dependencies_from_response(projects_response)
+            pyprojects = self._fetch_pyproject_tomls(projects_response)
+            dependencies = self._parse_dependencies_from_response(
+                projects_response, pyprojects
+            )
 
             for proj_response in projects_response:
                 name = proj_response["name"]
                 url = proj_response["http_url_to_repo"]
+                path = proj_response["path_with_namespace"]
                 dep = dependencies.get(name, [])
                 id = proj_response["id"]
-                projects[id] = ProjectInfo(name, url, dep)
+                projects[id] = ProjectInfo(name, url, path, dep)
+            self._name_to_url = {p.name: p.url for p in projects.values()}
+            if len(self._name_to_url) != len(projects):
+                logging.warning(
+                    f"Group {group_id} has projects with duplicate names, "
+                    "dependency URLs may be ambiguous"
+                )
+            self._pyprojects = pyprojects
+            self._reverse_deps = self._build_reverse_deps(projects)
 
             logging.info(f"Loaded {len(projects)} projects from group {group_id}")
             return projects
@@ -51,12 +84,20 @@ class DependencyManager:
             raise
 
     def _parse_dependencies_from_response(
-        self, response: List[Dict[str, Any]]
+        self, response: List[ProjectDict], tomls: Dict[int, Optional[str]]
     ) -> Dict[str, List[str]]:
         dependencies = {}
 
         for project in response:
-            project_toml = self.api.get_pyproject_toml(project["id"])
+            project_toml = tomls[project["id"]]
+            known_project = self._projects.get(project["id"])
+            if (
+                known_project is not None
+                and project_toml is not None
+                and project_toml == self._pyprojects.get(project["id"])
+            ):
+                dependencies[project["name"]] = known_project.dependencies
+                continue
 
             if project_toml is None:
                 logging.warning(
@@ -65,140 +106,267 @@ class DependencyManager:
                 dependencies[project["name"]] = []
                 continue
 
-            doc = tomlkit.parse(project_toml)
-            project_dependencies = doc.get("project", {}).get("dependencies", [])
-            dependencies[project["name"]] = project_dependencies
+            try:
+                doc = tomllib.loads(project_toml)
+                project_dependencies = doc["project"]["dependencies"]
+            except KeyError:
+                project_dependencies = ()
+            dependencies[project["name"]] = [
+                match.group(1)
+                for match in map(_DEP_NAME_RE.match, project_dependencies)
+                if match
+            ]
         return dependencies
 
+    def _fetch_pyproject_tomls(
+        self, response: List[ProjectDict]
+    ) -> Dict[int, Optional[str]]:
+        project_ids = [project["id"] for project in response]
+        try:
+            return self.api.get_pyproject_tomls_graphql(project_ids)
+        except Exception as e:
+            logging.warning(f"GraphQL batch fetch failed, falling back to REST: {e}")
+            return self.api.get_pyproject_tomls(project_ids)
+
     def _refresh_projects_data(self):
-        if not self._group_id:
+        if not self.group_id:
             return
         try:
-            self._projects = self._load_group_projects(self._group_id)
+            self._projects = self._load_group_projects(self.group_id)
             logging.info("Refreshed projects data from GitLab")
         except Exception as e:
             logging.error(f"Error refreshing projects data: {e}")
 
     def init_project_dependencies(self, project_id: int, dependencies: List[str]):
+        updated_content = self._render_project_dependencies(project_id, dependencies)
+        if updated_content is not None:
+            try:
+                self._create_commit_for_toml_updation(
+                    project_id, updated_content, "Update dependencies from config"
+                )
+                self._projects[project_id].dependencies = dependencies
+                logging.info(
+                    f"Updated project {project_id} ({self._projects[project_id].name})"
+                )
+            except Exception as e:
+                logging.error(
+                    f"Error updating dependencies for project {project_id}: {e}"
+                )
+        self._reverse_deps = self._build_reverse_deps(self._projects)
+
+    def init_projects_dependencies(self, dependencies: Dict[int, List[str]]):
+        updates = {}
+        for project_id, project_dependencies in dependencies.items():
+            updated_content = self._render_project_dependencies(
+                project_id, project_dependencies
+            )
+            if updated_content is not None:
+                updates[project_id] = updated_content
+        committed = self.batch_commit_changes(
+            updates, "Update dependencies from config"
+        )
+        for project_id in committed:
+            self._projects[project_id].dependencies = dependencies[project_id]
+        self._reverse_deps = self._build_reverse_deps(self._projects)
+
+    def _render_project_dependencies(
+        self, project_id: int, dependencies: List[str]
+    ) -> Optional[str]:
         try:
             current_content = self.api.get_pyproject_toml(project_id)
             if current_content is None:
                 logging.warning(f"pyproject.toml for project id={project_id} is None")
-                return
+                return None
 
-            doc = tomlkit.parse(current_content)
+            doc = tomllib.loads(current_content)
             correct_name = self._projects[project_id].name
 
             current_name = doc.get("project", {}).get("name", "")
+            deps_list = []
+            for dep_name in dependencies:
+                dep_url = self._find_dependency_url(dep_name)
+                if dep_url:
+                    deps_list.append(f"{dep_name} @ git+{dep_url}@main")
+                else:
+                    logging.warning(f"Dependency '{dep_name}' not found in group")
+                    deps_list.append(dep_name)
+
+            current_deps = doc.get("project", {}).get("dependencies", [])
+            same_deps = sorted(current_deps) == sorted(deps_list)
+            if current_name == correct_name and same_deps:
+                self._projects[project_id].dependencies = dependencies
+                logging.info(
+                    f"Dependencies of project {project_id} unchanged, skipping commit"
+                )
+                return None
+
             if current_name != correct_name:
                 logging.info(
                     f"Fixing project name: '{current_name}' -> '{correct_name}'"
                 )
                 doc["project"]["name"] = correct_name
+            doc["project"]["dependencies"] = deps_list
 
-            self._projects[project_id].dependencies = dependencies
-
-            deps_array = tomlkit.array()
-            for dep_name in dependencies:
-                dep_url = self._find_dependency_url(dep_name)
-                if dep_url:
-                    deps_array.append(f"{dep_name} @ git+{dep_url}@main")
-                else:
-                    logging.warning(f"Dependency '{dep_name}' not found in group")
-                    deps_array.append(dep_name)
+            updated_content = tomli_w.dumps(doc)
+            return updated_content
 
-            doc["project"]["dependencies"] = deps_array
+        except Exception as e:
+            logging.error(f"Error updating dependencies for project {project_id}: {e}")
+            return None
 
-            updated_content = tomlkit.dumps(doc)
-            commit_data = {
-                "branch": "main",
-                "commit_message": "Update dependencies from config",
+    def batch_commit_changes(
+        self,
+        updates: Dict[int, str],
+        commit_message: str = "Update pyproject.toml",
+        branch: str = "main",
+    ) -> List[int]:
+        if not updates:
+            return []
+        commits = [
+            {
+                "projectPath": self._projects[project_id].path,
+                "branch": branch,
+                "message": commit_message,
                 "actions": [
                     {
-                        "action": "update",
-                        "file_path": "pyproject.toml",
+                        "action": "UPDATE",
+                        "filePath": "pyproject.toml",
                         "content": updated_content,
                     }
                 ],
             }
-            self.api.commit_changes(project_id, commit_data)
-            logging.info(f"Updated project {project_id} ({correct_name})")
+            for project_id, updated_content in updates.items()
+        ]
+        committed = []
+        results = self.api.create_commits(commits)
+        for project_id, commit_errors in zip(updates, results):
+            name = self._projects[project_id].name
+            if commit_errors is None:
+                logging.warning(
+                    f"GraphQL commit to project {name} failed, falling back to REST"
+                )
+                try:
+                    self._create_commit_for_toml_updation(
+                        project_id, updates[project_id], commit_message, branch
+                    )
+                    committed.append(project_id)
+                except Exception as commit_error:
+                    logging.error(
+                        f"Error committing to project {project_id}: {commit_error}"
+                    )
+            elif commit_errors:
+                logging.error(f"Failed to commit to project {name}: {commit_errors}")
+            else:
+                committed.append(project_id)
+                logging.info(f"Updated project {project_id} ({name})")
+        return committed
 
-        except Exception as e:
-            logging.error(f"Error updating dependencies for project {project_id}: {e}")
+    def rename_project(self, project_id: int, name: str):
+        project = self._projects[project_id]
+        self._name_to_url.pop(project.name, None)
+        project.name = name
+        self._name_to_url[name] = project.url
 
     def _find_dependency_url(self, dep_name: str) -> Optional[str]:
-        for project_info in self._projects.values():
-            if project_info.name == dep_name:
-                return project_info.url
-        return None
+        return self._name_to_url.get(dep_name)
+
+    @staticmethod
+    def _build_reverse_deps(projects: Dict[int, ProjectInfo]) -> Dict[str, List[int]]:
+        reverse_deps = defaultdict(list)
+        for id, project in projects.items():
+            for dep in dict.fromkeys(map(canonicalize_name, project.dependencies)):
+                reverse_deps[dep].append(id)
+        return dict(reverse_deps)
 
     def _get_depended_projects_id(self, project_name: str) -> List[int]:
-        depended_projects = []
-        for id, project in self._projects.items():
-            for dep in project.dependencies:
-                if project_name in dep:
-                    depended_projects.append(id)
-        return depended_projects
+        return self._reverse_deps.get(canonicalize_name(project_name), [])
 
     def update_all_direct_dependencies(self, package_info: Dict[str, Any]):
-        self._refresh_projects_data()
-        depended_projects = self._get_depended_projects_id(package_info["name"])
+        self.update_dependencies_batch([package_info])
 
-        for proj_id in depended_projects:
-            branch_name = (
-                f"auto-update-{package_info['name']}-{package_info['version']}"
-            )
-            self.api.create_branch(proj_id, branch_name, "main")
-            content = self.api.get_pyproject_toml(proj_id, branch_name)
-            updated_content = self._update_toml_dependencies(
-                content, package_info["name"], package_info["version"]
-            )
-            self._create_commit_for_toml_updation(
-                proj_id, updated_content, branch=branch_name
-            )
+    def update_dependencies_batch(self, packages: List[Dict[str, Any]]):
+        if self._projects_stale:
+            self._refresh_projects_data()
+        self._projects_stale = True
+        for package_info in packages:
+            self._update_direct_dependencies(package_info)
 
-            tag_name = f"v{package_info['version']}-mr-auto"
-            self.api.create_tag(proj_id, tag_name, branch_name)
-            mr_data = {
-                "source_branch": branch_name,
-                "target_branch": "main",
-                "title": f"Update {package_info['name']}",
-                "remove_source_branch": True,
-            }
+    def _update_direct_dependencies(self, package_info: Dict[str, Any]):
+        depended_projects = self._get_depended_projects_id(package_info["name"])
 
-            mr_response = self.api.create_merge_request(proj_id, mr_data)
+        with ThreadPoolExecutor(max_workers=self.api.max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self._update_dependent_project, proj_id, package_info
+                ): proj_id
+                for proj_id in depended_projects
+            }
+            for future in as_completed(futures):
+                proj_id = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(
+                        f"Failed to update {self._projects[proj_id].name}: {e}"
+                    )
+
+    def _update_dependent_project(self, proj_id: int, package_info: Dict[str, Any]):
+        content = self.api.get_pyproject_toml(proj_id)
+        if content is None:
+            raise ValueError(f"pyproject.toml of project id={proj_id} is unavailable")
+        updated_content = self._update_toml_dependencies(
+            content, package_info["name"], package_info["version"]
+        )
+        if updated_content is None:
             logging.info(
-                f"Created MR for {self._projects[proj_id].name}: {mr_response.get('web_url')}"
+                f"{self._projects[proj_id].name} already up to date "
+                f"with {package_info['name']}, skipping MR"
             )
+            return
+
+        branch_name = f"auto-update-{package_info['name']}-{package_info['version']}"
+        self.api.create_branch(proj_id, branch_name, "main")
+        self._create_commit_for_toml_updation(
+            proj_id, updated_content, branch=branch_name
+        )
+
+        tag_name = f"v{package_info['version']}-mr-auto"
+        self.api.create_tag(proj_id, tag_name, branch_name)
+        mr_data = {
+            "source_branch": branch_name,
+            "target_branch": "main",
+            "title": f"Update {package_info['name']}",
+            "remove_source_branch": True,
+        }
+
+        mr_response = self.api.create_merge_request(proj_id, mr_data)
+        logging.info(
+            f"Created MR for {self._projects[proj_id].name}: {mr_response.get('web_url')}"
+        )
 
     def _update_toml_dependencies(
         self, content: str, package_name: str, package_version: str
-    ) -> str:
-        doc = tomlkit.parse(content)
+    ) -> Optional[str]:
+        doc = tomllib.loads(content)
         deps_array = doc["project"]["dependencies"]
-        updated_deps_array = tomlkit.array()
-
-        for dep in deps_array:
-            dep_str = str(dep).strip()
+        package_name = canonicalize_name(package_name)
+        changed = False
 
-            if dep_str.startswith(f"{package_name} @ git+"):
-                updated_dep = f"{package_name}>={package_version}"
-                logging.info(
-                    f"Rewrite dependency from GitLab to Nexus: {dep} -> {updated_dep}"
-                )
-            elif dep_str.startswith(f"{package_name}>=") or dep_str.startswith(
-                f"{package_name}=="
-            ):
-                updated_dep = f"{package_name}>={package_version}"
-                logging.info(f"Nexus version update: {dep} -> {updated_dep}")
-            else:
-                updated_dep = dep
-
-            updated_deps_array.append(updated_dep)
+        for i, dep in enumerate(deps_array):
+            match = _DEP_NAME_RE.match(dep)
+            if not match or canonicalize_name(match.group(1)) != package_name:
+                continue
+            if not dep[match.end() :].startswith(_UPDATABLE_SPECS):
+                continue
+            updated_dep = f"{match.group(1)}>={package_version}"
+            if dep.strip() != updated_dep:
+                logging.info(f"Dependency update: {dep} -> {updated_dep}")
+                deps_array[i] = updated_dep
+                changed = True
 
-        doc["project"]["dependencies"] = updated_deps_array
-        return tomlkit.dumps(doc)
+        if not changed:
+            return None
+        return tomli_w.dumps(doc)
 
     def _create_commit_for_toml_updation(
         self,
@@ -221,34 +389,40 @@ class DependencyManager:
         self.api.commit_changes(project_id, commit_data)
 
     def build_module_map(self) -> str:
-        dependencies = {}
+        canonical_names = {
+            canonicalize_name(project.name): project.name
+            for project in self._projects.values()
+        }
+        modules = set()
+        root_modules = set()
+        edges = set()
         for project in self._projects.values():
-            dependencies[project.name] = project.dependencies
-
-        mermaid_lines = [
-            "graph TD",
-            "classDef root fill:#dcfce7,stroke:#22c55e,color:#166534,stroke-width:2px",
-            "classDef middle fill:#fef3c7,stroke:#f59e0b,color:#92400e,stroke-width:2px",
-            "classDef leaf fill:#fee2e2,stroke:#ef4444,color:#991b1b,stroke-width:3px",
-        ]
-
-        root_modules = [key for key, deps in dependencies.items() if not deps]
-        all_deps = {dep for deps_list in dependencies.values() for dep in deps_list}
-        leaf_modules = set(dependencies.keys()) - all_deps
-
-        for module in sorted(set(dependencies.keys())):
-            if module in root_modules:
-                mermaid_lines.append(f"{module}:::root")
-            elif module in leaf_modules:
-                mermaid_lines.append(f"{module}:::leaf")
-            else:
-                mermaid_lines.append(f"{module}:::middle")
+            modules.add(project.name)
+            if not project.dependencies:
+                root_modules.add(project.name)
+            edges.update(
+                (canonical_names.get(canonicalize_name(dep), dep), project.name)
+                for dep in project.dependencies
+            )
 
-        for module, deps in dependencies.items():
-            for dep in deps:
-                mermaid_lines.append(f"{dep} --> {module}")
+        leaf_modules = modules.difference(dep for dep, _ in edges)
+
+        def _lines():
+            yield "graph TD"
+            yield "classDef root fill:#dcfce7,stroke:#22c55e,color:#166534,stroke-width:2px"
+            yield "classDef middle fill:#fef3c7,stroke:#f59e0b,color:#92400e,stroke-width:2px"
+            yield "classDef leaf fill:#fee2e2,stroke:#ef4444,color:#991b1b,stroke-width:3px"
+            for module in sorted(modules):
+                if module in root_modules:
+                    yield f"{module}:::root"
+                elif module in leaf_modules:
+                    yield f"{module}:::leaf"
+                else:
+                    yield f"{module}:::middle"
+            for dep, module in sorted(edges):
+                yield f"{dep} --> {module}"
 
-        return "\n".join(mermaid_lines)
+        return "\n".join(_lines())
 
     def save_module_map_to_root(self, filename="MODULE_MAP.md"):
         module_map = self.build_module_map()
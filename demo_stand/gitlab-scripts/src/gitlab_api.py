@@ -1,36 +1,107 @@
-import base64
+import hashlib
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 import socket
+import threading
+import time
+import orjson
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 script_path = Path(__file__)
 env_path = script_path.parent.parent.parent / ".env"
 load_dotenv(env_path)
 
+GRAPHQL_BATCH_SIZE = 25
+PROJECTS_PER_PAGE = 100
+RATE_LIMIT_MIN_REMAINING = 10
+CONNECTION_CHECK_TTL = 300
+JSON_HEADERS = {"Content-Type": "application/json"}
+PYPROJECT_TOMLS_QUERY = """
+query($ids: [ID!], $first: Int, $ref: String) {
+  projects(ids: $ids, first: $first) {
+    nodes {
+      id
+      repository {
+        blobs(paths: ["pyproject.toml"], ref: $ref) { nodes { rawBlob } }
+      }
+    }
+  }
+}
+"""
+
+
+class ProjectDict(TypedDict):
+    id: int
+    name: str
+    http_url_to_repo: str
+    path_with_namespace: str
+
+
+_CHECKED: Dict[Tuple[str, str], float] = {}
+
+
+def _json(response: requests.Response) -> Any:
+    return orjson.loads(response.content)
+
 
 class GitLabAPI:
-    def __init__(self, base_url: str = None, timeout: int = 30):
+    _instance: Optional["GitLabAPI"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, base_url: str = None, timeout: int = 30, max_workers: int = 16):
         if base_url is None:
             base_url = self._detect_gitlab_url()
         self.base_url = base_url
         self.api_url = f"{self.base_url}/api/v4"
         self.timeout = timeout
+        self.max_workers = max_workers
         self.token = os.getenv("GITLAB_ACCESS_TOKEN")
-        self.headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json",
-        }
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+        self.session = self._create_session()
+        self._pyproject_cache: Dict[Tuple[int, str], Tuple[str, str]] = {}
+        self._namespace_id: Optional[int] = None
+        self._groups: Dict[int, Dict[str, Any]] = {}
 
         if not self.token:
             logging.error("GITLAB_ACCESS_TOKEN environment variable is not set")
             raise ValueError("GITLAB_ACCESS_TOKEN is required")
 
-        if not self._check_connection():
-            raise ConnectionError("Failed to connect to GitLab")
+        if os.getenv("GITLAB_SKIP_PROBE") == "1":
+            logging.info("Skipping GitLab connection check")
+            return
+
+        check_key = (self.base_url, hashlib.sha256(self.token.encode()).hexdigest())
+        checked_at = _CHECKED.get(check_key)
+        if checked_at is None or time.monotonic() - checked_at > CONNECTION_CHECK_TTL:
+            if not self._check_connection():
+                raise ConnectionError("Failed to connect to GitLab")
+            _CHECKED[check_key] = time.monotonic()
+
+    @classmethod
+    def get_instance(cls) -> "GitLabAPI":
+        with cls._instance_lock:
+            token = os.getenv("GITLAB_ACCESS_TOKEN")
+            if cls._instance is None or cls._instance.token != token:
+                cls._instance = cls()
+            return cls._instance
+
+    def close(self):
+        with GitLabAPI._instance_lock:
+            if GitLabAPI._instance is self:
+                GitLabAPI._instance = None
+        self.session.close()
+
+    def __enter__(self) -> "GitLabAPI":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def _detect_gitlab_url(self) -> str:
         if os.path.exists("/.dockerenv"):
@@ -49,11 +120,44 @@ class GitLabAPI:
 
         return os.getenv("GITLAB_EXTERNAL_URL", "http://localhost:8080")
 
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.hooks["response"].append(self._throttle)
+        retries = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers,
+            pool_maxsize=self.max_workers,
+            max_retries=retries,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _throttle(self, response: requests.Response, *args, **kwargs):
+        remaining = response.headers.get("RateLimit-Remaining")
+        reset = response.headers.get("RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        if int(remaining) > RATE_LIMIT_MIN_REMAINING:
+            return
+
+        delay = int(reset) - time.time()
+        if delay > 0:
+            logging.warning(
+                f"GitLab rate limit almost exhausted ({remaining} left), "
+                f"sleeping {delay:.1f}s"
+            )
+            time.sleep(delay)
+
     def _check_connection(self) -> bool:
         try:
-            response = requests.get(
-                f"{self.api_url}/user", headers=self.headers, timeout=self.timeout
-            )
+            response = self.session.get(f"{self.api_url}/user", timeout=self.timeout)
             if response.status_code == 200:
                 logging.info("Connected to GitLab")
                 return True
@@ -64,22 +168,52 @@ class GitLabAPI:
             logging.error(f"Connection error: {e}")
             return False
 
-    def _request(self, method: str, endpoint: str, **kwargs) -> Any:
+    def _send(self, method: str, endpoint: str, **kwargs) -> requests.Response:
         url = f"{self.api_url}{endpoint}"
+        if "json" in kwargs:
+            kwargs["data"] = orjson.dumps(kwargs.pop("json"))
+            kwargs["headers"] = {**JSON_HEADERS, **kwargs.get("headers", {})}
         try:
-            response = requests.request(
+            response = self.session.request(
                 method=method,
                 url=url,
-                headers={**self.headers, **kwargs.pop("headers", {})},
                 timeout=self.timeout,
                 **kwargs,
             )
             response.raise_for_status()
-            return response.json() if response.content else None
+            return response
         except Exception as e:
             logging.error(f"GitLab API error {method} {endpoint}: {e}")
             raise
 
+    def _request(self, method: str, endpoint: str, **kwargs) -> Any:
+        response = self._send(method, endpoint, **kwargs)
+        return _json(response) if response.content else None
+
+    def graphql(self, query: str, variables: Dict[str, Any] = None) -> Dict[str, Any]:
+        result = self._graphql_result(query, variables)
+        if result.get("errors"):
+            logging.error(f"GitLab GraphQL errors: {result['errors']}")
+            raise ValueError(f"GraphQL query failed: {result['errors']}")
+        return result["data"]
+
+    def _graphql_result(
+        self, query: str, variables: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/graphql",
+                data=orjson.dumps({"query": query, "variables": variables or {}}),
+                headers=JSON_HEADERS,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            result = _json(response)
+        except Exception as e:
+            logging.error(f"GitLab GraphQL error: {e}")
+            raise
+        return result
+
     def _get(self, endpoint: str, **kwargs) -> Any:
         return self._request("GET", endpoint, **kwargs)
 
@@ -92,8 +226,30 @@ class GitLabAPI:
     def _delete(self, endpoint: str, **kwargs) -> Any:
         return self._request("DELETE", endpoint, **kwargs)
 
-    def get_all_projects_from_group(self, group_id: int) -> List[Dict[str, Any]]:
-        projects = self._get(f"/groups/{group_id}/projects")
+    def get_all_projects_from_group(self, group_id: int) -> List[ProjectDict]:
+        endpoint = f"/groups/{group_id}/projects"
+        params = {"per_page": PROJECTS_PER_PAGE, "simple": "true"}
+        first_page = self._send("GET", endpoint, params={**params, "page": 1})
+        projects = _json(first_page)
+
+        total_pages = first_page.headers.get("X-Total-Pages")
+        if total_pages is None:
+            next_page = first_page
+            while "next" in next_page.links:
+                next_url = next_page.links["next"]["url"]
+                next_page = self._send("GET", next_url.split("/api/v4", 1)[1])
+                projects.extend(_json(next_page))
+            return projects
+
+        total_pages = int(total_pages)
+        if total_pages > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pages = executor.map(
+                    lambda page: self._get(endpoint, params={**params, "page": page}),
+                    range(2, total_pages + 1),
+                )
+                for page in pages:
+                    projects.extend(page)
         return projects
 
     def get_project(self, project_id: int) -> Dict[str, Any]:
@@ -101,32 +257,80 @@ class GitLabAPI:
         return project
 
     def get_user_namespace(self) -> Optional[int]:
-        user_data = self._get(f"/user")
-        namespace_id = user_data.get("namespace_id") if user_data else None
-        return namespace_id
+        if self._namespace_id is None:
+            user_data = self._get(f"/user")
+            self._namespace_id = user_data.get("namespace_id") if user_data else None
+        return self._namespace_id
 
     def get_group(self, group_id: int) -> Dict[str, Any]:
-        group = self._get(f"/groups/{group_id}")
-        return group
+        if group_id not in self._groups:
+            self._groups[group_id] = self._get(f"/groups/{group_id}")
+        return self._groups[group_id]
 
     def get_pyproject_toml(self, project_id: int, ref: str = "main") -> Optional[str]:
+        cached = self._pyproject_cache.get((project_id, ref))
         try:
-            file_data = self._get(
-                f"/projects/{project_id}/repository/files/pyproject.toml",
+            response = self._send(
+                "GET",
+                f"/projects/{project_id}/repository/files/pyproject.toml/raw",
                 params={"ref": ref},
+                headers={"If-None-Match": cached[0]} if cached else {},
             )
+            if response.status_code == 304:
+                logging.debug(
+                    f"pyproject.toml not modified in project id={project_id}, ref: {ref}"
+                )
+                return cached[1]
+
             logging.debug(
                 f"Received pyproject.toml from project id={project_id}, ref: {ref}"
             )
-            return base64.b64decode(file_data["content"]).decode("utf-8")
+            content = response.content.decode("utf-8")
+            etag = response.headers.get("ETag")
+            if etag:
+                self._pyproject_cache[(project_id, ref)] = (etag, content)
+            return content
         except Exception as e:
             logging.error(
                 f"Error with getting pyproject.toml from project id={project_id}: {e}"
             )
             return None
 
+    def get_pyproject_tomls(
+        self, project_ids: List[int], ref: str = "main"
+    ) -> Dict[int, Optional[str]]:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            contents = executor.map(
+                lambda project_id: self.get_pyproject_toml(project_id, ref), project_ids
+            )
+            return dict(zip(project_ids, contents))
+
+    def get_pyproject_tomls_graphql(
+        self, project_ids: List[int], ref: str = "main"
+    ) -> Dict[int, Optional[str]]:
+        contents = dict.fromkeys(project_ids)
+        for start in range(0, len(project_ids), GRAPHQL_BATCH_SIZE):
+            batch = project_ids[start : start + GRAPHQL_BATCH_SIZE]
+            variables = {
+                "ids": [f"gid://gitlab/Project/{project_id}" for project_id in batch],
+                "first": len(batch),
+                "ref": ref,
+            }
+            data = self.graphql(PYPROJECT_TOMLS_QUERY, variables)
+
+            for project in data["projects"]["nodes"]:
+                project_id = int(project["id"].rsplit("/", 1)[-1])
+                blobs = ((project.get("repository") or {}).get("blobs") or {}).get(
+                    "nodes"
+                )
+                contents[project_id] = blobs[0]["rawBlob"] if blobs else None
+        logging.debug(
+            f"Received pyproject.toml for {len(contents)} projects via GraphQL"
+        )
+        return contents
+
     def fork_project(self, project_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
-        return self._post(f"/projects/{project_id}/fork", json=data)
+        return self._post(f"/projects/{project_id}/fork", params=data)
 
     def create_group(self, data: Dict[str, Any]) -> Dict[str, Any]:
         return self._post(f"/groups", json=data)
@@ -142,6 +346,35 @@ class GitLabAPI:
         )
         return commit
 
+    def create_commits(
+        self, commits: List[Dict[str, Any]]
+    ) -> List[Optional[List[str]]]:
+        results = []
+        for start in range(0, len(commits), GRAPHQL_BATCH_SIZE):
+            batch = commits[start : start + GRAPHQL_BATCH_SIZE]
+            params = ", ".join(f"$c{i}: CommitCreateInput!" for i in range(len(batch)))
+            fields = " ".join(
+                f"c{i}: commitCreate(input: $c{i}) {{ errors }}"
+                for i in range(len(batch))
+            )
+            variables = {f"c{i}": commit for i, commit in enumerate(batch)}
+            try:
+                result = self._graphql_result(
+                    f"mutation({params}) {{ {fields} }}", variables
+                )
+            except Exception:
+                results.extend([None] * len(batch))
+                continue
+
+            if result.get("errors"):
+                logging.warning(f"GitLab GraphQL errors: {result['errors']}")
+            data = result.get("data") or {}
+            for i in range(len(batch)):
+                payload = data.get(f"c{i}")
+                results.append(None if payload is None else payload["errors"])
+        logging.info(f"Submitted {len(commits)} commits via GraphQL")
+        return results
+
     def create_tag(
         self, project_id: int, tag_name: str, ref: str = "main", message: str = None
     ) -> Dict[str, Any]:
@@ -162,5 +395,16 @@ class GitLabAPI:
         return self._post(f"/projects/{project_id}/merge_requests", json=data)
 
     def remove_fork(self, project_id: int):
-        self._delete(f"/projects/{project_id}/fork")
+        try:
+            with self._send(
+                "DELETE", f"/projects/{project_id}/fork", stream=True
+            ) as response:
+                status = response.status_code
+        except requests.HTTPError as e:
+            e.response.close()
+            raise
+
+        if status == 304:
+            logging.info(f"Project id={project_id} is not linked to a fork")
+            return
         logging.info(f"Fork relationship removed for project id={project_id}")
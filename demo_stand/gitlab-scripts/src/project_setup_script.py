@@ -1,6 +1,7 @@
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
@@ -13,6 +14,9 @@ script_path = Path(__file__)
 env_path = script_path.parent.parent.parent / ".env"
 load_dotenv(env_path)
 
+MAX_PARALLEL_FORKS = 8
+_PATH_TABLE = str.maketrans(" ", "-")
+
 
 class GitLabProjectCreator:
     def __init__(self):
@@ -30,6 +34,15 @@ class GitLabProjectCreator:
             )
             sys.exit(1)
 
+    def close(self):
+        self.api.close()
+
+    def __enter__(self) -> "GitLabProjectCreator":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def create_project_from_template(
         self,
         new_project_name: str,
@@ -38,19 +51,38 @@ class GitLabProjectCreator:
         try:
             data = {
                 "name": new_project_name,
-                "path": new_project_name.lower().replace(" ", "-"),
+                "path": new_project_name.translate(_PATH_TABLE).lower(),
                 "namespace_id": self.group_id,
             }
             project = self.api.fork_project(template_project_id, data)
             logging.info(
                 f"{new_project_name} created from template: {project['web_url']}"
             )
-            self.api.remove_fork(project["id"])
-            return project
         except Exception as e:
             logging.error(f"Failed to create {new_project_name}: {e}")
             return None
 
+        try:
+            self.api.remove_fork(project["id"])
+        except Exception as e:
+            logging.warning(
+                f"{new_project_name} is still linked to the template fork: {e}"
+            )
+        return project
+
+    def create_projects(
+        self,
+        names: List[str],
+        template_project_id: int,
+        concurrency: int = MAX_PARALLEL_FORKS,
+    ) -> List[Optional[Dict[str, Any]]]:
+        def create_one(name: str) -> Optional[Dict[str, Any]]:
+            logging.info(f"Creating project: {name}")
+            return self.create_project_from_template(name, template_project_id)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(create_one, names))
+
     def create_modules_from_config(
         self, config: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
@@ -61,16 +93,14 @@ class GitLabProjectCreator:
             return []
 
         created_modules = []
+        modules_config = config.get("modules", [])
 
-        for module_config in config.get("modules", []):
-            module_name = module_config["name"]
-            logging.info(f"Creating module: {module_name}")
-
-            project = self.create_project_from_template(
-                new_project_name=module_name,
-                template_project_id=template_id,
-            )
+        projects = self.create_projects(
+            [module_config["name"] for module_config in modules_config], template_id
+        )
 
+        for module_config, project in zip(modules_config, projects):
+            module_name = module_config["name"]
             if project:
                 module_info = {
                     "id": project["id"],
@@ -89,17 +119,18 @@ class GitLabProjectCreator:
             logging.warning("No modules to update dependencies for")
             return
         try:
-            dp_manager = DependencyManager(int(self.group_id))
+            dp_manager = DependencyManager(int(self.group_id), api=self.api)
 
             for module_info in modules:
                 if module_info["id"] in dp_manager._projects:
-                    dp_manager._projects[module_info["id"]].name = module_info["name"]
+                    dp_manager.rename_project(module_info["id"], module_info["name"])
 
-            for module_info in modules:
-                dp_manager.init_project_dependencies(
-                    module_info["id"],
-                    module_info["dependencies"],
-                )
+            dp_manager.init_projects_dependencies(
+                {
+                    module_info["id"]: module_info["dependencies"]
+                    for module_info in modules
+                }
+            )
             logging.info("All dependencies updated")
         except Exception as e:
             logging.error(
@@ -125,15 +156,15 @@ def load_config():
 
 def main():
     config = load_config()
-    creator = GitLabProjectCreator()
-    created_modules = creator.create_modules_from_config(config)
-
-    if created_modules:
-        creator.write_dependencies_in_toml(created_modules)
-        logging.info(f"Created and configured {len(created_modules)} modules")
-    else:
-        logging.error("No modules were created")
-        sys.exit(1)
+    with GitLabProjectCreator() as creator:
+        created_modules = creator.create_modules_from_config(config)
+
+        if created_modules:
+            creator.write_dependencies_in_toml(created_modules)
+            logging.info(f"Created and configured {len(created_modules)} modules")
+        else:
+            logging.error("No modules were created")
+            sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -2,15 +2,19 @@ import asyncio
 import logging
 import os
 import re
+import threading
 import time
 from asyncio import Lock, Queue
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from gitlab_scripts.dependency_manager import DependencyManager
+from gitlab_scripts.gitlab_api import GitLabAPI
+from packaging.version import InvalidVersion, Version
 from pydantic import BaseModel
 
 logging.basicConfig(
@@ -19,6 +23,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+_EXEC = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dm")
+_WHEEL_RE = re.compile(
+    r"(?:.*/)?(?P<name>[^/]*?)-(?P<version>\d+\.\d+\.\d+[^-/]*)(?:-[^/]*)?\.whl$"
+)
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(env_path)
 
@@ -28,11 +36,16 @@ class WebhookQueue:
         self._queue = Queue()
         self._processing_lock = Lock()
         self._dm = None
+        self._dm_lock = threading.Lock()
         self._group_id = os.getenv("GROUP_ID")
         logger.info(f"WebhookQueue initialized with group_id: {self._group_id}")
 
     @property
     def dm(self):
+        with self._dm_lock:
+            return self._connect()
+
+    def _connect(self):
         if self._dm is None:
             max_retries = 5
             for i in range(max_retries):
@@ -50,27 +63,59 @@ class WebhookQueue:
 
     async def process_queue(self):
         while True:
-            package_info = await self._queue.get()
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
             async with self._processing_lock:
+                names = ", ".join(package_info["name"] for package_info in batch)
                 try:
-                    if self._dm is None:
-                        _ = self.dm
-
-                    loop = asyncio.get_event_loop()
-                    await loop.run_in_executor(
-                        None, self.dm.update_all_direct_dependencies, package_info
+                    packages = coalesce_packages(batch)
+                    await asyncio.get_running_loop().run_in_executor(
+                        _EXEC, self._update_dependencies, packages
                     )
-                    logger.info(f"Processed {package_info['package_name']}")
+                    logger.info(f"Processed {names}")
                 except Exception as e:
-                    logger.error(
-                        f"Failed to process {package_info.get('package_name')}: {e}"
-                    )
+                    logger.error(f"Failed to process {names}: {e}")
                 finally:
-                    self._queue.task_done()
+                    for _ in batch:
+                        self._queue.task_done()
+
+    def warm_up(self):
+        try:
+            GitLabAPI.get_instance()
+        except Exception as e:
+            logger.warning(f"GitLab warm-up failed, will retry on first event: {e}")
+
+    def reset(self):
+        with self._dm_lock:
+            if self._dm is not None:
+                self._dm.api.close()
+            self._dm = None
+
+    def _update_dependencies(self, packages: List[Dict[str, Any]]):
+        self.dm.update_dependencies_batch(packages)
 
     async def add_to_queue(self, package_info: Dict):
         await self._queue.put(package_info)
-        logger.info(f"Queued {package_info['package_name']}")
+        logger.info(f"Queued {package_info['name']}")
+
+
+def coalesce_packages(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    latest: Dict[str, Tuple[Version, Dict[str, Any]]] = {}
+    for package_info in batch:
+        try:
+            version = Version(package_info["version"])
+        except InvalidVersion:
+            logger.error(
+                f"Skipping {package_info['name']}: "
+                f"invalid version {package_info['version']!r}"
+            )
+            continue
+        current = latest.get(package_info["name"])
+        if current is None or version > current[0]:
+            latest[package_info["name"]] = (version, package_info)
+    return [package_info for _, package_info in latest.values()]
 
 
 webhook_queue = WebhookQueue()
@@ -78,6 +123,7 @@ webhook_queue = WebhookQueue()
 
 @app.on_event("startup")
 async def startup_event():
+    asyncio.get_running_loop().run_in_executor(_EXEC, webhook_queue.warm_up)
     asyncio.create_task(webhook_queue.process_queue())
     logger.info("Queue processor started")
 
@@ -99,18 +145,10 @@ class NexusWebhook(BaseModel):
 
 
 def parse_wheel_filename(filename: str) -> Optional[Dict[str, str]]:
-    basename = filename.split("/")[-1]
-    if not basename.endswith(".whl"):
+    match = _WHEEL_RE.match(filename)
+    if not match:
         return None
-
-    parts = basename[:-4].split("-")
-
-    for i, part in enumerate(parts):
-        if re.match(r"\d+\.\d+\.\d+", part):
-            name = "-".join(parts[:i]).replace("_", "-")
-            return {"name": name, "version": part}
-
-    return None
+    return {"name": match["name"].replace("_", "-"), "version": match["version"]}
 
 
 @app.post("/webhook/nexus")
@@ -126,7 +164,7 @@ async def handle_nexus_webhook(payload: NexusWebhook):
         return {"status": "error", "reason": "Failed to parse filename"}
 
     package_info = {
-        "package_name": parsed["name"],
+        "name": parsed["name"],
         "version": parsed["version"],
         "repository": payload.repositoryName,
         "timestamp": payload.timestamp,
@@ -156,7 +194,8 @@ async def reload_token(request: Request):
 
     if new_token:
         os.environ["GITLAB_ACCESS_TOKEN"] = new_token
-        webhook_queue._dm = None
+        async with webhook_queue._processing_lock:
+            await asyncio.get_running_loop().run_in_executor(_EXEC, webhook_queue.reset)
         logger.info(f"Token updated")
         return {"status": "ok"}
 